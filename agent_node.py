@@ -1,42 +1,49 @@
 import json
 import logging
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI
+import re
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.runnables import Runnable, RunnableConfig
 from pydantic import ValidationError
 
-from models import MarketingMediaPlan
-from prompts import SYSTEM_PROMPT
+from models import MarketingMediaPlan, FinalPlanMessage
+from prompts import CONVERSATIONAL_PROMPT, FINAL_SCHEMA_PROMPT
 
 logger = logging.getLogger(__name__)
 
-async def agent_node(state: dict, llm: ChatOpenAI, tools):
-    messages = list(state['messages'])
+# Built once; the same instances are safe to share since they are never mutated
+CONVERSATION_SYSTEM_MESSAGE = SystemMessage(content=CONVERSATIONAL_PROMPT)
+FINALIZE_SYSTEM_MESSAGE = SystemMessage(content=CONVERSATIONAL_PROMPT + FINAL_SCHEMA_PROMPT)
 
-    if not messages or (messages and messages[0].content != SYSTEM_PROMPT):
-        from langchain_core.messages import SystemMessage
-        messages.insert(0, SystemMessage(content=SYSTEM_PROMPT))
+_FINALIZE_RE = re.compile(
+    r"^(looks good|finalize it|yes|correct|approved?|looks correct|that'?s right)\b",
+    re.IGNORECASE
+)
 
-    finalize_keywords = ["looks good", "finalize it", "yes", "correct", "approve", "looks correct", "that's right"]
+async def agent_node(state: dict, config: RunnableConfig, *, llm_with_tools: Runnable, llm_with_plan: Runnable):
+    # config is passed to the LLM explicitly: on Python < 3.11 LangChain cannot recover it
+    # from contextvars, and without it no token stream events reach astream_events.
+    history = state['messages']
     should_finalize = False
 
-    if len(messages) > 2 and isinstance(messages[-1], HumanMessage):
-        last_human_message = messages[-1].content.lower().strip()
-        if isinstance(messages[-2], AIMessage) and not messages[-2].tool_calls:
-            if any(keyword == last_human_message for keyword in finalize_keywords) or \
-               any(last_human_message.startswith(keyword) for keyword in finalize_keywords):
+    if len(history) > 1 and isinstance(history[-1], HumanMessage):
+        if isinstance(history[-2], AIMessage) and not history[-2].tool_calls:
+            if _FINALIZE_RE.match(history[-1].content.strip()):
                 logger.info("User message suggests finalization. Attempting structured output.")
                 should_finalize = True
 
+    # The system prompt is never written back to the checkpointed state, so it is
+    # always prepended here rather than compared against messages[0] each turn.
+    # Only the finalize turn carries the plan's JSON schema.
     if should_finalize:
-        llm_with_plan_structure = llm.with_structured_output(MarketingMediaPlan, include_raw=False)
+        messages = [FINALIZE_SYSTEM_MESSAGE, *history]
         logger.info("Generating final structured marketing plan...")
 
         try:
-            final_plan_object = await llm_with_plan_structure.ainvoke(messages)
+            final_plan_object = await llm_with_plan.ainvoke(messages, config)
             if isinstance(final_plan_object, MarketingMediaPlan):
                 final_json_str = final_plan_object.model_dump_json(indent=2)
                 logger.info("Structured output generated successfully.")
-                return {"messages": [AIMessage(content=final_json_str, name="FinalPlanOutput")]}
+                return {"messages": [FinalPlanMessage(content=final_json_str)]}
             else:
                 logger.error(f"LLM did not return a MarketingMediaPlan object. Got: {type(final_plan_object)}")
                 return {"messages": [AIMessage(content="Error: Could not produce final plan. Please confirm again.")]}
@@ -47,7 +54,7 @@ async def agent_node(state: dict, llm: ChatOpenAI, tools):
             logger.error(f"Unexpected error: {e}", exc_info=True)
             return {"messages": [AIMessage(content=f"Unexpected error: {e}. Please try confirming again.")]}
     else:
-        llm_with_tools = llm.bind_tools(tools)
+        messages = [CONVERSATION_SYSTEM_MESSAGE, *history]
         logger.info("Continuing conversation with tools...")
-        response = await llm_with_tools.ainvoke(messages)
+        response = await llm_with_tools.ainvoke(messages, config)
         return {"messages": [response]}
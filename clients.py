@@ -0,0 +1,46 @@
+import functools
+
+import httpx
+import openai
+from langchain_openai import ChatOpenAI
+from langchain_community.tools.tavily_search import TavilySearchResults
+
+from config import (
+    OPENAI_API_KEY, TAVILY_API_KEY, LLM_MODEL, TAVILY_MAX_RESULTS,
+    LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS
+)
+from tools import analyze_business_website, google_trends_analyzer
+
+@functools.lru_cache(maxsize=1)
+def get_llm() -> ChatOpenAI:
+    """
+    Returns the process-wide LLM, so every caller shares one HTTP connection pool to OpenAI.
+    """
+    if not OPENAI_API_KEY:
+        raise ValueError("OpenAI API key is not configured.")
+
+    http_async_client = openai.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS
+        )
+    )
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        temperature=0.0,
+        openai_api_key=OPENAI_API_KEY,
+        streaming=True,
+        http_async_client=http_async_client
+    )
+
+@functools.lru_cache(maxsize=1)
+def get_tools() -> list:
+    """
+    Returns the process-wide list of tools.
+    """
+    if not TAVILY_API_KEY:
+        raise ValueError("Tavily API key is not configured.")
+
+    tavily_search = TavilySearchResults(max_results=TAVILY_MAX_RESULTS, api_key=TAVILY_API_KEY)
+
+    return [analyze_business_website, google_trends_analyzer, tavily_search]
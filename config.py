@@ -10,3 +10,11 @@ TAVILY_MAX_RESULTS = 5
 HTTP_TIMEOUT = 20
 RETRY_ATTEMPTS = 3
 RETRY_WAIT_SECONDS = 2
+LLM_MAX_CONNECTIONS = 200
+LLM_MAX_KEEPALIVE_CONNECTIONS = 100
+SESSION_MAX_COUNT = 10000
+SESSION_TTL_SECONDS = 7200
+SESSION_PURGE_INTERVAL_SECONDS = 60
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.db")
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+UVICORN_WORKERS = int(os.getenv("UVICORN_WORKERS", "1"))
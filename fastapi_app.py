@@ -1,17 +1,30 @@
 import uvicorn
 import asyncio
+import json
 import uuid
 import logging
+import time
+from typing import Optional
+from contextlib import AsyncExitStack
+import aiosqlite
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage
 from langgraph.graph import StateGraph
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
 # Import your existing modules
-from config import OPENAI_API_KEY, TAVILY_API_KEY
-from graph_builder import build_graph
-from models import GraphState
+from config import (
+    OPENAI_API_KEY, TAVILY_API_KEY, CHECKPOINT_DB_PATH,
+    SESSION_MAX_COUNT, SESSION_TTL_SECONDS, SESSION_PURGE_INTERVAL_SECONDS, UVICORN_WORKERS,
+    WARMUP_ON_STARTUP
+)
+from clients import get_llm, get_tools
+from graph_builder import build_graph, CHECKPOINT_SERDE, CONVERSATION_TAG
+from models import FinalPlanMessage
+from tools import aclose_http_client
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,48 +35,186 @@ class ChatRequest(BaseModel):
     session_id: str
     user_message: str
 
+class SessionStore:
+    """
+    Maps session_id to thread_id in a `sessions` table next to the checkpoints, so
+    sessions survive restarts and are shared by every worker. A session expires
+    SESSION_TTL_SECONDS after its last request, and beyond SESSION_MAX_COUNT the least
+    recently used are dropped; either way its checkpoints are deleted with it.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            thread_id TEXT NOT NULL,
+            last_seen REAL NOT NULL
+        )
+    """
+
+    def __init__(self, checkpointer: AsyncSqliteSaver):
+        self.checkpointer = checkpointer
+        self.conn = checkpointer.conn
+
+    async def setup(self):
+        # The checkpointer's setup creates its tables and switches the database to WAL mode
+        await self.checkpointer.setup()
+        async with self.checkpointer.lock:
+            await self.conn.execute(self.SCHEMA)
+            await self.conn.commit()
+
+    async def create(self, session_id: str, thread_id: str):
+        async with self.checkpointer.lock:
+            await self.conn.execute(
+                "INSERT INTO sessions (session_id, thread_id, last_seen) VALUES (?, ?, ?)",
+                (session_id, thread_id, time.time())
+            )
+            await self.conn.commit()
+
+    async def touch(self, session_id: str) -> Optional[str]:
+        """
+        Returns the session's thread_id and refreshes its TTL, or None if the session
+        is unknown or has expired.
+        """
+        now = time.time()
+        async with self.checkpointer.lock:
+            async with self.conn.execute(
+                "SELECT thread_id FROM sessions WHERE session_id = ? AND last_seen >= ?",
+                (session_id, now - SESSION_TTL_SECONDS)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                return None
+            await self.conn.execute("UPDATE sessions SET last_seen = ? WHERE session_id = ?", (now, session_id))
+            await self.conn.commit()
+        return row[0]
+
+    async def purge(self):
+        """Deletes expired and over-capacity sessions along with their checkpoints."""
+        async with self.checkpointer.lock:
+            rows = await self.conn.execute_fetchall(
+                "SELECT session_id, thread_id FROM sessions WHERE last_seen < ? "
+                "UNION ALL SELECT * FROM ("
+                "  SELECT session_id, thread_id FROM sessions WHERE last_seen >= ? "
+                "  ORDER BY last_seen DESC LIMIT -1 OFFSET ?"
+                ")",
+                (time.time() - SESSION_TTL_SECONDS,) * 2 + (SESSION_MAX_COUNT,)
+            )
+        for session_id, thread_id in rows:
+            await self._delete(session_id, thread_id)
+
+    async def delete_orphaned_threads(self):
+        """
+        Deletes checkpoints whose session no longer exists, e.g. threads left behind by
+        a crash mid-purge. Safe while other workers serve turns: every thread id is a
+        fresh uuid whose session row is committed before its first checkpoint, and the
+        sweep runs as one BEGIN IMMEDIATE transaction, so it can't interleave with
+        another process's writes.
+        """
+        orphaned = "thread_id NOT IN (SELECT thread_id FROM sessions)"
+        async with self.checkpointer.lock:
+            try:
+                await self.conn.execute("BEGIN IMMEDIATE")
+                await self.conn.execute(f"DELETE FROM writes WHERE {orphaned}")
+                cursor = await self.conn.execute(f"DELETE FROM checkpoints WHERE {orphaned}")
+                await self.conn.commit()
+            except Exception as e:
+                await self.conn.rollback()
+                logger.warning(f"Failed to delete orphaned checkpoints: {e}")
+                return
+        if cursor.rowcount:
+            logger.info(f"Deleted {cursor.rowcount} orphaned checkpoints")
+
+    async def _delete(self, session_id: Optional[str], thread_id: str):
+        try:
+            await self.checkpointer.adelete_thread(thread_id)
+            if session_id is not None:
+                async with self.checkpointer.lock:
+                    await self.conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                    await self.conn.commit()
+            logger.info(f"Deleted checkpoints for thread_id: {thread_id}")
+        except Exception as e:
+            logger.warning(f"Failed to delete checkpoints for thread_id {thread_id}: {e}")
+
 # Global FastAPI app
 app = FastAPI()
 
-# A dictionary to track user sessions in-memory:
-#   sessions_data[session_id] = {"thread_id": <some_uuid>}
-sessions_data = {}
+# Bounded, expiring session_id -> thread_id map, created on startup with the checkpointer
+sessions: SessionStore = None
 
 # We'll store the compiled graph in a global variable so we can reuse it
 langgraph_app: StateGraph = None
 
+# Background tasks: dropping checkpoints of expired sessions, and the startup warm-up call
+purge_task: asyncio.Task = None
+warmup_task: asyncio.Task = None
+
+# Keeps the SQLite checkpointer's connection open for the app's lifetime
+resource_stack = AsyncExitStack()
+
+async def purge_expired_sessions():
+    """
+    Periodically expires stale sessions and deletes their LangGraph checkpoints.
+    """
+    while True:
+        await asyncio.sleep(SESSION_PURGE_INTERVAL_SECONDS)
+        try:
+            await sessions.purge()
+        except Exception as e:
+            logger.warning(f"Session purge failed: {e}")
+
+async def warm_up_llm():
+    """
+    Sends one single-token completion through the shared LLM client, so the first real
+    /chat doesn't pay for the TLS handshake and client setup. It runs no graph turn and
+    writes no checkpoints, so every worker can do it independently.
+    """
+    try:
+        await get_llm().bind(max_tokens=1).ainvoke([HumanMessage(content="ping")])
+        logger.info("LLM warm-up call completed.")
+    except Exception as e:
+        logger.warning(f"LLM warm-up call failed: {e}")
+
 @app.on_event("startup")
 async def on_startup():
     """
     Called when FastAPI starts. Build the LangGraph app with your LLM and tools.
     """
-    global langgraph_app
+    global langgraph_app, sessions, purge_task, warmup_task
 
     if not OPENAI_API_KEY or not TAVILY_API_KEY:
         logger.error("Missing OPENAI_API_KEY or TAVILY_API_KEY in environment variables.")
         raise RuntimeError("Missing API keys in environment variables.")
 
-    # The "build_graph" function requires an LLM and list of tools.
-    # Typically you do something like:
-    from langchain_openai import ChatOpenAI
-    from langchain_community.tools.tavily_search import TavilySearchResults
-    from tools import analyze_business_website, google_trends_analyzer
-
-    def create_llm(api_key: str):
-        return ChatOpenAI(model="gpt-4o", temperature=0.0, openai_api_key=api_key, streaming=True)
+    llm = get_llm()
+    tools = get_tools()
 
-    def create_tools(tavily_api_key: str):
-        # Here you might pass TAVILY_MAX_RESULTS, etc. from config, but keep it simple for now.
-        tavily_search = TavilySearchResults(max_results=5, api_key=tavily_api_key)
-        return [analyze_business_website, google_trends_analyzer, tavily_search]
-
-    llm = create_llm(OPENAI_API_KEY)
-    tools = create_tools(TAVILY_API_KEY)
+    # Checkpoints and sessions go to SQLite so they are shared by all workers, kept off
+    # the heap, and still match each other after a restart.
+    conn = await resource_stack.enter_async_context(aiosqlite.connect(CHECKPOINT_DB_PATH))
+    checkpointer = AsyncSqliteSaver(conn, serde=CHECKPOINT_SERDE)
+    sessions = SessionStore(checkpointer)
+    await sessions.setup()
+    await sessions.delete_orphaned_threads()
 
     # Build the LangGraph app
-    langgraph_app = build_graph(llm, tools)
+    langgraph_app = build_graph(llm, tools, checkpointer=checkpointer)
     logger.info("LangGraph app built successfully for FastAPI deployment.")
 
+    purge_task = asyncio.create_task(purge_expired_sessions())
+    if WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(warm_up_llm())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """
+    Called when FastAPI stops. Stop background tasks, close the checkpoint database
+    and the tools' shared HTTP client.
+    """
+    for task in (purge_task, warmup_task):
+        if task:
+            task.cancel()
+    await resource_stack.aclose()
+    await aclose_http_client()
+
 @app.post("/start")
 async def start_session():
     """
@@ -72,41 +223,41 @@ async def start_session():
     session_id = str(uuid.uuid4())
     # For each session, we also create a unique thread_id for memory state
     thread_id = str(uuid.uuid4())
-    sessions_data[session_id] = {"thread_id": thread_id}
+    await sessions.create(session_id, thread_id)
 
     logger.info(f"Created new session_id: {session_id}, thread_id: {thread_id}")
     return {"session_id": session_id}
 
+async def get_session_thread_id(session_id: str) -> str:
+    """
+    Look up the memory thread_id for a session, refreshing the session's TTL.
+    """
+    thread_id = await sessions.touch(session_id)
+    if thread_id is None:
+        raise HTTPException(status_code=400, detail="Invalid session_id. Start a session first.")
+    return thread_id
+
 @app.post("/chat")
 async def chat(request: ChatRequest):
     """
     Send a message from the user to the chatbot and get the AI's response.
-    The conversation state is tracked using 'thread_id' from sessions_data.
+    The conversation state is tracked using the session's 'thread_id'.
     """
-    if request.session_id not in sessions_data:
-        raise HTTPException(status_code=400, detail="Invalid session_id. Start a session first.")
-
     # Get the existing memory thread_id for this session
-    thread_id = sessions_data[request.session_id]["thread_id"]
+    thread_id = await get_session_thread_id(request.session_id)
 
     # Build the new messages input
     graph_input = {
         "messages": [HumanMessage(content=request.user_message)]
     }
 
-    # We'll store final output after we consume the astream
-    final_state_messages = []
-
-    # The config must pass the thread_id so MemorySaver knows which conversation to continue
+    # The config must pass the thread_id so the checkpointer knows which conversation to continue
     config = {"configurable": {"thread_id": thread_id}}
 
-    # Run the graph in streaming mode
+    # Run the turn to completion; only the terminal state is needed here
     try:
-        async for event in langgraph_app.astream(graph_input, config=config, stream_mode="values"):
-            current_messages = event.get("messages", [])
-            if current_messages:
-                final_state_messages = current_messages
-        # After a complete turn, final_state_messages should have the new agent response
+        final_state = await langgraph_app.ainvoke(graph_input, config=config)
+        final_state_messages = final_state.get("messages", [])
     except Exception as e:
         logger.error(f"Error in chat processing: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -119,15 +270,60 @@ async def chat(request: ChatRequest):
 
     # If the last message is the final JSON plan, we can return it directly,
     # or indicate some "final" flag in the response. Let's keep it simple:
-    is_final = (getattr(last_message, "name", "") == "FinalPlanOutput")
+    is_final = isinstance(last_message, FinalPlanMessage)
 
     return {
         "ai_message": last_message.content,
         "final_plan": is_final
     }
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Same as /chat, but streams the AI's response as Server-Sent Events.
+    Each token arrives as {"token": ...}; a closing {"ai_message": ..., "final_plan": ...}
+    event carries the complete last message once the turn finishes. The final plan is
+    not streamed as tokens; it only arrives in that closing event.
+    """
+    thread_id = await get_session_thread_id(request.session_id)
+    graph_input = {"messages": [HumanMessage(content=request.user_message)]}
+    config = {"configurable": {"thread_id": thread_id}}
+
+    async def event_stream():
+        try:
+            async for event in langgraph_app.astream_events(graph_input, config=config, version="v2"):
+                if event["event"] != "on_chat_model_stream" or CONVERSATION_TAG not in event["tags"]:
+                    continue
+                # Tool-call chunks carry no text content
+                token = event["data"]["chunk"].content
+                if token:
+                    yield f"data: {json.dumps({'token': token})}\n\n"
+
+            final_state = await langgraph_app.aget_state(config)
+            final_state_messages = final_state.values.get("messages", [])
+            if not final_state_messages:
+                yield f"data: {json.dumps({'error': 'No AI response was generated.'})}\n\n"
+                return
+
+            last_message = final_state_messages[-1]
+            is_final = isinstance(last_message, FinalPlanMessage)
+            yield f"data: {json.dumps({'ai_message': last_message.content, 'final_plan': is_final})}\n\n"
+        except Exception as e:
+            logger.error(f"Error in streaming chat processing: {e}", exc_info=True)
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 
 # Optional: if you want to run with `python fastapi_app.py` directly:
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
-
+    # Sessions and checkpoints both live in SQLite, so UVICORN_WORKERS can be raised
+    # to serve turns from several processes.
+    uvicorn.run(
+        "fastapi_app:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=UVICORN_WORKERS
+    )
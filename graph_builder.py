@@ -1,19 +1,38 @@
-import asyncio
+import functools
 import logging
 
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode, tools_condition
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
 
-from models import GraphState
+from models import GraphState, MarketingMediaPlan, FinalPlanMessage
 from agent_node import agent_node
 
 logger = logging.getLogger(__name__)
 
-def build_graph(llm, tools):
+# FinalPlanMessage is our own message type, so checkpointers must be told it is safe to restore
+CHECKPOINT_SERDE = JsonPlusSerializer(allowed_msgpack_modules=[FinalPlanMessage])
+
+# Tags the conversational model's runs, so streaming clients can show its tokens and skip
+# the finalize turn, whose structured output streams the plan JSON as text
+CONVERSATION_TAG = "conversation"
+
+def build_graph(llm, tools, checkpointer=None):
+    """
+    Compiles the agent/tools graph. Checkpoints are kept in process memory unless
+    another checkpointer (e.g. an AsyncSqliteSaver) is provided.
+    """
     graph = StateGraph(GraphState)
 
-    graph.add_node("agent", lambda state: asyncio.run(agent_node(state, llm, tools)))
+    # Bind tools and the plan schema once; both build JSON schemas on every call
+    llm_with_tools = llm.bind_tools(tools).with_config(tags=[CONVERSATION_TAG])
+    llm_with_plan = llm.with_structured_output(MarketingMediaPlan, include_raw=False)
+
+    graph.add_node(
+        "agent",
+        functools.partial(agent_node, llm_with_tools=llm_with_tools, llm_with_plan=llm_with_plan)
+    )
     tool_node = ToolNode(tools)
     graph.add_node("tools", tool_node)
 
@@ -30,5 +49,5 @@ def build_graph(llm, tools):
 
     graph.add_edge("tools", "agent")
 
-    app = graph.compile(checkpointer=MemorySaver())
+    app = graph.compile(checkpointer=checkpointer or MemorySaver(serde=CHECKPOINT_SERDE))
     return app
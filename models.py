@@ -1,6 +1,7 @@
 from typing import Optional, List, Dict, TypedDict, Sequence, Annotated
 import operator
 
+from langchain_core.messages import AIMessage
 from pydantic import BaseModel, Field
 
 
@@ -54,5 +55,10 @@ class MarketingMediaPlan(BaseModel):
     timeline_suggestion: Optional[str] = Field(None, description="Suggested campaign timeline or duration.")
     data_source_notes: Optional[str] = Field(None, description="Notes on any data limitations or tool failures.")
 
+class FinalPlanMessage(AIMessage):
+    """
+    AI message carrying the final MarketingMediaPlan as JSON.
+    """
+
 class GraphState(TypedDict):
     messages: Annotated[Sequence, operator.add]
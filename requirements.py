@@ -1,12 +0,0 @@
-langchain
-langgraph
-langchain-core
-langchain-openai
-tavily-python
-pytrends
-pandas
-beautifulsoup4
-httpx
-python-dotenv
-langchain-community
-watchdog
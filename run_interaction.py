@@ -1,9 +1,11 @@
-import asyncio
 import logging
 import uuid
 
+import aioconsole
 from langchain_core.messages import HumanMessage, AIMessage
 
+from models import FinalPlanMessage
+
 logger = logging.getLogger(__name__)
 
 async def run_interaction_loop(app):
@@ -11,7 +13,7 @@ async def run_interaction_loop(app):
     print("\nWelcome to the AI Marketing Media Plan Generator!")
     print("Please provide the URL of the business website.")
 
-    initial_url = await asyncio.to_thread(input, "User URL: ")
+    initial_url = await aioconsole.ainput("User URL: ")
     if not initial_url:
         print("No URL provided. Exiting.")
         return
@@ -33,7 +35,7 @@ async def run_interaction_loop(app):
 
                     last_message = current_messages[-1]
                     if isinstance(last_message, AIMessage) and not last_message.tool_calls:
-                        if last_message.name == "FinalPlanOutput":
+                        if isinstance(last_message, FinalPlanMessage):
                             print("\n--- Final Plan ---")
                             print(last_message.content)
                             final_plan_generated = True
@@ -44,7 +46,7 @@ async def run_interaction_loop(app):
                 print("\nMarketing plan generation complete.")
                 break
 
-            next_input = await asyncio.to_thread(input, "User: ")
+            next_input = await aioconsole.ainput("User: ")
             if next_input.lower() in ["quit", "exit", "stop"]:
                 logger.info("User requested exit.")
                 break
@@ -1,49 +1,127 @@
 import asyncio
 import streamlit as st
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
 import uuid
 import logging
+from typing import AsyncIterator, Iterator
 
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import StateGraph
 
-from config import OPENAI_API_KEY, TAVILY_API_KEY
-from graph_builder import build_graph
-
-from langchain_openai import ChatOpenAI
-from langchain_community.tools.tavily_search import TavilySearchResults
-from tools import analyze_business_website, google_trends_analyzer
+from clients import get_llm, get_tools
+from graph_builder import build_graph, CONVERSATION_TAG
+from models import FinalPlanMessage
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
-def create_llm(api_key: str) -> ChatOpenAI:
-    if not api_key:
-        raise ValueError("OpenAI API key is not configured.")
-    return ChatOpenAI(model="gpt-4o", temperature=0.0, openai_api_key=api_key, streaming=True)
+async def stream_graph_turn(langgraph_app: StateGraph, user_input: str, thread_id: str) -> AsyncIterator[str]:
+    """Runs one turn of the graph, yielding the assistant's text tokens as they arrive."""
+    graph_input = {"messages": [HumanMessage(content=user_input)]}
+    config = {"configurable": {"thread_id": thread_id}}
 
-def create_tools(tavily_api_key: str):
-    if not tavily_api_key:
-        raise ValueError("Tavily API key is not configured.")
-    tavily_search = TavilySearchResults(max_results=5, api_key=tavily_api_key)
-    return [analyze_business_website, google_trends_analyzer, tavily_search]
+    async for event in langgraph_app.astream_events(graph_input, config=config, version="v2"):
+        # The finalize turn's structured output streams plan JSON; it is rendered once complete
+        if event["event"] != "on_chat_model_stream" or CONVERSATION_TAG not in event["tags"]:
+            continue
+        # Tool-call chunks carry no text content
+        token = event["data"]["chunk"].content
+        if token:
+            yield token
 
-async def run_graph_turn(langgraph_app: StateGraph, user_input: str, thread_id: str) -> list:
-    graph_input = {"messages": [HumanMessage(content=user_input)]}
+async def get_last_message(langgraph_app: StateGraph, thread_id: str):
     config = {"configurable": {"thread_id": thread_id}}
+    state = await langgraph_app.aget_state(config)
+    messages = state.values.get("messages", [])
+    return messages[-1] if messages else None
+
+def iterate_in_loop(async_iterator: AsyncIterator, loop: asyncio.AbstractEventLoop) -> Iterator:
+    """Drives an async iterator on the background loop, one item at a time, for st.write_stream."""
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(async_iterator.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        # Streamlit abandons the generator if the script is rerun mid-turn
+        asyncio.run_coroutine_threadsafe(async_iterator.aclose(), loop).result()
+
+@st.cache_resource
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    One event loop per process, running in a daemon thread. Streamlit re-executes this
+    script on every interaction, so the loop is cached rather than created at import.
+    Reusing it keeps the LLM client's HTTP connections alive across turns.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+@st.cache_resource
+def init_langgraph_app() -> Future:
+    """
+    Starts building the graph in a background thread and returns its future, so the
+    first page paints without waiting on client setup.
+    """
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(lambda: build_graph(get_llm(), get_tools()))
+    executor.shutdown(wait=False)
+    return future
+
+def render_message(msg):
+    if isinstance(msg, HumanMessage):
+        with st.chat_message("user"):
+            st.write(msg.content)
+    elif isinstance(msg, FinalPlanMessage):
+        # content is already the indented JSON produced on the finalize turn
+        with st.chat_message("assistant"):
+            st.write("**Final Marketing Plan (JSON)**")
+            st.code(msg.content, language="json")
+    elif isinstance(msg, AIMessage):
+        with st.chat_message("assistant"):
+            st.write(msg.content)
+
+def chat_turn(langgraph_app_future: Future):
+    """
+    Handles chat input, streaming the assistant's reply below the history.
+    """
+    if user_input := st.chat_input(placeholder="Type your message here..."):
+        human_msg = HumanMessage(content=user_input)
+        st.session_state.messages.append(human_msg)
 
-    final_state_messages = []
-    async for state in langgraph_app.astream(graph_input, config=config, stream_mode="values"):
-        current_messages = state.get("messages", [])
-        if current_messages:
-            final_state_messages = current_messages
+        with st.chat_message("user"):
+            st.write(user_input)
+
+        thread_id = st.session_state.thread_id
+
+        langgraph_app = langgraph_app_future.result()
+        loop = get_event_loop()
 
-    return final_state_messages
+        with st.chat_message("assistant"):
+            placeholder = st.empty()
+            with placeholder.container():
+                streamed_text = st.write_stream(
+                    iterate_in_loop(stream_graph_turn(langgraph_app, user_input, thread_id), loop)
+                )
 
-def init_langgraph_app() -> StateGraph:
-    llm = create_llm(OPENAI_API_KEY)
-    tools = create_tools(TAVILY_API_KEY)
-    return build_graph(llm, tools)
+            new_ai_message = asyncio.run_coroutine_threadsafe(
+                get_last_message(langgraph_app, thread_id), loop
+            ).result()
+
+            if isinstance(new_ai_message, AIMessage):
+                st.session_state.messages.append(new_ai_message)
+
+                # The plan arrives as structured output rather than tokens, and a turn that
+                # called tools may have streamed text from more than one model call
+                if isinstance(new_ai_message, FinalPlanMessage):
+                    with placeholder.container():
+                        st.write("**Final Marketing Plan (JSON)**")
+                        st.code(new_ai_message.content, language="json")
+                elif streamed_text != new_ai_message.content:
+                    placeholder.write(new_ai_message.content)
 
 def main():
     st.set_page_config(page_title="AI Marketing Plan Chatbot", layout="wide")
@@ -53,8 +131,7 @@ def main():
     with st.chat_message("assistant"):
         st.write("Hello! Please provide the business website URL you'd like me to analyze for creating a marketing media plan.")
 
-    if "langgraph_app" not in st.session_state:
-        st.session_state.langgraph_app = init_langgraph_app()
+    langgraph_app_future = init_langgraph_app()
 
     if "thread_id" not in st.session_state:
         st.session_state.thread_id = str(uuid.uuid4())
@@ -63,43 +140,9 @@ def main():
         st.session_state.messages = []
 
     for msg in st.session_state.messages:
-        if isinstance(msg, HumanMessage):
-            with st.chat_message("user"):
-                st.write(msg.content)
-        elif isinstance(msg, AIMessage):
-            if getattr(msg, "name", "") == "FinalPlanOutput":
-                with st.chat_message("assistant"):
-                    st.write("**Final Marketing Plan (JSON)**")
-                    st.code(msg.content, language="json")
-            else:
-                with st.chat_message("assistant"):
-                    st.write(msg.content)
-
-    if user_input := st.chat_input(placeholder="Type your message here..."):
-        human_msg = HumanMessage(content=user_input)
-        st.session_state.messages.append(human_msg)
-
-        with st.chat_message("user"):
-            st.write(user_input)
+        render_message(msg)
 
-        langgraph_app = st.session_state.langgraph_app
-        thread_id = st.session_state.thread_id
-
-        latest_messages = asyncio.run(run_graph_turn(langgraph_app, user_input, thread_id))
-
-        if latest_messages:
-            new_ai_message = latest_messages[-1]
-
-            st.session_state.messages.append(new_ai_message)
-
-            if isinstance(new_ai_message, AIMessage):
-                if getattr(new_ai_message, "name", "") == "FinalPlanOutput":
-                    with st.chat_message("assistant"):
-                        st.write("**Final Marketing Plan (JSON)**")
-                        st.code(new_ai_message.content, language="json")
-                else:
-                    with st.chat_message("assistant"):
-                        st.write(new_ai_message.content)
+    chat_turn(langgraph_app_future)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,123 @@
+import asyncio
+from types import SimpleNamespace
+
+import aiosqlite
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+import fastapi_app
+from fastapi_app import SessionStore
+from graph_builder import CHECKPOINT_SERDE
+
+TTL = 100
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable stand-in for the time module used by SessionStore."""
+    fake = SimpleNamespace(now=1_000.0)
+    fake.time = lambda: fake.now
+    monkeypatch.setattr(fastapi_app, "time", fake)
+    monkeypatch.setattr(fastapi_app, "SESSION_TTL_SECONDS", TTL)
+    return fake
+
+
+@pytest.fixture
+def run_with_store(tmp_path):
+    """Runs `scenario(store)` against a fresh SessionStore on a temporary database."""
+    def run(scenario):
+        async def main():
+            async with aiosqlite.connect(tmp_path / "checkpoints.db") as conn:
+                store = SessionStore(AsyncSqliteSaver(conn, serde=CHECKPOINT_SERDE))
+                await store.setup()
+                await scenario(store)
+        asyncio.run(main())
+    return run
+
+
+async def put_checkpoint(store: SessionStore, thread_id: str):
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    config = await store.checkpointer.aput(config, empty_checkpoint(), {}, {})
+    await store.checkpointer.aput_writes(config, [("messages", "hello")], "task")
+
+
+async def thread_ids(store: SessionStore, table: str) -> set:
+    rows = await store.conn.execute_fetchall(f"SELECT DISTINCT thread_id FROM {table}")
+    return {thread_id for (thread_id,) in rows}
+
+
+def test_touch_returns_thread_and_refreshes_ttl(clock, run_with_store):
+    async def scenario(store):
+        await store.create("s1", "t1")
+        clock.now += TTL - 1
+        assert await store.touch("s1") == "t1"
+        # Still alive TTL - 1 seconds after the refresh, although 2 * TTL - 2 after creation
+        clock.now += TTL - 1
+        assert await store.touch("s1") == "t1"
+
+    run_with_store(scenario)
+
+
+def test_touch_rejects_expired_and_unknown_sessions(clock, run_with_store):
+    async def scenario(store):
+        await store.create("s1", "t1")
+        clock.now += TTL + 1
+        assert await store.touch("s1") is None
+        assert await store.touch("missing") is None
+
+    run_with_store(scenario)
+
+
+def test_purge_deletes_expired_sessions_with_their_checkpoints(clock, run_with_store):
+    async def scenario(store):
+        await store.create("old", "t-old")
+        await put_checkpoint(store, "t-old")
+        clock.now += TTL / 2
+        await store.create("new", "t-new")
+        await put_checkpoint(store, "t-new")
+
+        clock.now += TTL / 2 + 1
+        await store.purge()
+
+        assert await store.touch("old") is None
+        assert await store.touch("new") == "t-new"
+        assert await thread_ids(store, "checkpoints") == {"t-new"}
+        assert await thread_ids(store, "writes") == {"t-new"}
+
+    run_with_store(scenario)
+
+
+def test_purge_evicts_least_recently_used_over_capacity(clock, monkeypatch, run_with_store):
+    monkeypatch.setattr(fastapi_app, "SESSION_MAX_COUNT", 2)
+
+    async def scenario(store):
+        for n in (1, 2, 3):
+            await store.create(f"s{n}", f"t{n}")
+            await put_checkpoint(store, f"t{n}")
+            clock.now += 1
+        # s1 is the oldest but was just used, so s2 is the least recently used
+        assert await store.touch("s1") == "t1"
+
+        await store.purge()
+
+        assert await store.touch("s2") is None
+        assert await store.touch("s1") == "t1"
+        assert await store.touch("s3") == "t3"
+        assert await thread_ids(store, "checkpoints") == {"t1", "t3"}
+
+    run_with_store(scenario)
+
+
+def test_delete_orphaned_threads_keeps_session_threads(clock, run_with_store):
+    async def scenario(store):
+        await store.create("s1", "t1")
+        await put_checkpoint(store, "t1")
+        await put_checkpoint(store, "t-orphan")
+
+        await store.delete_orphaned_threads()
+
+        assert await thread_ids(store, "checkpoints") == {"t1"}
+        assert await thread_ids(store, "writes") == {"t1"}
+
+    run_with_store(scenario)
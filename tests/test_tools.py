@@ -0,0 +1,106 @@
+import asyncio
+
+import httpx
+from lxml import etree
+
+import tools
+from tools import MAX_PAGE_BYTES, MAX_SAMPLE_ELEMENTS, _PageSignals, _stream_page_signals
+
+SOCIAL_HREFS = [
+    "https://facebook.com/acme",
+    "https://twitter.com/acme",
+    "https://instagram.com/acme",
+    "https://linkedin.com/company/acme",
+    "https://linkedin.com/in/acme-founder",
+    "https://youtube.com/channel/acme",
+    "https://youtube.com/user/acme",
+]
+
+# A page head that fills every field _PageSignals collects
+COMPLETE_HEAD = (
+    "<html><head><title>Acme</title></head><body>"
+    + "<h2>Heading</h2>" * MAX_SAMPLE_ELEMENTS
+    + "<p>Paragraph</p>" * MAX_SAMPLE_ELEMENTS
+    + "".join(f'<a href="{href}">link</a>' for href in SOCIAL_HREFS)
+).encode()
+
+FILLER_CHUNK = b"<div>filler</div>" * 4096
+
+
+def anchor(href: str) -> etree._Element:
+    return etree.Element("a", href=href)
+
+
+def stream_page(chunks):
+    """
+    Streams `chunks` as an HTML response to _stream_page_signals, and returns the
+    signals together with the number of bytes the body generator handed out.
+    """
+    sent = 0
+
+    async def body():
+        nonlocal sent
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+
+    def handler(request):
+        return httpx.Response(200, headers={"content-type": "text/html; charset=utf-8"}, content=body())
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await _stream_page_signals(client, "https://example.com")
+
+    signals = asyncio.run(main())
+    return signals, sent
+
+
+def test_anchors_done_once_every_platform_is_found():
+    signals = _PageSignals()
+    for href in SOCIAL_HREFS[:-1]:
+        signals.add(anchor(href))
+    assert not signals.anchors_done
+    signals.add(anchor(SOCIAL_HREFS[-1]))
+    assert signals.anchors_done
+    assert len(signals.found_platforms) == tools.SOCIAL_PLATFORM_COUNT
+
+
+def test_anchors_stop_being_scanned_after_the_limit(monkeypatch):
+    monkeypatch.setattr(tools, "MAX_ANCHORS_SCANNED", 3)
+    signals = _PageSignals()
+    for n in range(3):
+        signals.add(anchor(f"https://example.com/page-{n}"))
+    assert signals.anchors_done
+    signals.add(anchor(SOCIAL_HREFS[0]))
+    assert signals.anchors_scanned == 3
+    assert signals.social_links == []
+
+
+def test_paragraphs_done_after_the_text_sample_fills():
+    signals = _PageSignals()
+    paragraph = etree.Element("p")
+    paragraph.text = "x" * tools.MAX_TEXT_SAMPLE_CHARS
+    signals.add(paragraph)
+    assert not signals.paragraphs_done
+    signals.add(paragraph)
+    assert signals.paragraphs_done
+    signals.add(paragraph)
+    assert len(signals.paragraphs) == 2
+
+
+def test_stream_stops_once_every_field_is_collected():
+    signals, sent = stream_page([COMPLETE_HEAD, FILLER_CHUNK, FILLER_CHUNK, FILLER_CHUNK])
+    assert signals.complete
+    assert signals.title == "Acme"
+    assert len(signals.social_links) == len(SOCIAL_HREFS)
+    # The filler chunks were never pulled from the response
+    assert sent < len(COMPLETE_HEAD) + 2 * len(FILLER_CHUNK)
+
+
+def test_stream_reads_at_most_max_page_bytes():
+    filler_count = MAX_PAGE_BYTES // len(FILLER_CHUNK) + 1
+    chunks = [b"<html><body>"] + [FILLER_CHUNK] * filler_count + [b"<title>Too late</title>"] + [FILLER_CHUNK] * 10
+    signals, sent = stream_page(chunks)
+    # Reading stops within one chunk of the cap, and nothing past it is parsed
+    assert sent <= MAX_PAGE_BYTES + len(FILLER_CHUNK)
+    assert signals.title is None
@@ -1,22 +1,21 @@
-import json
 import asyncio
+import codecs
+import functools
 import logging
+import random
+import re
+import threading
+from urllib.parse import urlsplit, urlunsplit
 
 import httpx
-from bs4 import BeautifulSoup
+import orjson
+from async_lru import alru_cache
+from lxml import etree
 from typing import List
 
+from cachetools.func import ttl_cache
 from langchain_core.tools import tool
 
-try:
-    from pytrends.request import TrendReq
-    import pandas as pd
-except ImportError:
-    TrendReq = None
-    pd = None
-
-from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
-
 from models import WebsiteAnalysisInput, GoogleTrendsInput
 
 logger = logging.getLogger(__name__)
@@ -27,21 +26,179 @@ RETRYABLE_EXCEPTIONS = (
     httpx.HTTPStatusError
 )
 
+# One named group per platform; a match's lastgroup says which platform it was
+SOCIAL_LINK_RE = re.compile(
+    r"(?P<facebook>facebook\.com/)|(?P<twitter>twitter\.com/)|(?P<instagram>instagram\.com/)"
+    r"|(?P<linkedin_company>linkedin\.com/company/)|(?P<linkedin_in>linkedin\.com/in/)"
+    r"|(?P<youtube_channel>youtube\.com/channel/)|(?P<youtube_user>youtube\.com/user/)"
+)
+SOCIAL_PLATFORM_COUNT = SOCIAL_LINK_RE.groups
+
 RETRY_ATTEMPTS = 3
 RETRY_WAIT_SECONDS = 2
 HTTP_TIMEOUT = 20
 
-@retry(
-    stop=stop_after_attempt(RETRY_ATTEMPTS),
-    wait=wait_fixed(RETRY_WAIT_SECONDS),
-    retry=retry_if_exception_type(RETRYABLE_EXCEPTIONS),
-    reraise=True
+# Caps on how much of a page analyze_business_website reads and reports
+MAX_PAGE_BYTES = 2_000_000
+MAX_SAMPLE_ELEMENTS = 10
+MAX_TEXT_SAMPLE_CHARS = 500
+MAX_ANCHORS_SCANNED = 2000
+
+# Repeat analyses of the same site within this window are answered from memory
+WEBSITE_CACHE_MAX_SIZE = 64
+WEBSITE_CACHE_TTL_SECONDS = 3600
+
+# Trend data moves slowly; identical queries within this window are answered from memory
+TRENDS_CACHE_MAX_SIZE = 128
+TRENDS_CACHE_TTL_SECONDS = 3600
+
+# Shared across calls so repeat visits reuse pooled (and HTTP/2 multiplexed) connections
+_HTTP_CLIENT = httpx.AsyncClient(
+    follow_redirects=True,
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    timeout=HTTP_TIMEOUT,
+    headers={'User-Agent': 'Mozilla/5.0'}
 )
-async def _execute_request_async(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
-    logger.debug(f"Executing async {method.upper()} request to {url}")
-    response = await client.request(method, url, timeout=HTTP_TIMEOUT, **kwargs)
-    response.raise_for_status()
-    return response
+
+def _dumps(result_dict: dict) -> str:
+    """Serializes a tool result; numpy scalars are encoded natively, anything else via str."""
+    return orjson.dumps(
+        result_dict, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    ).decode()
+
+async def aclose_http_client():
+    """Closes the shared HTTP client. Call once on application shutdown."""
+    await _HTTP_CLIENT.aclose()
+
+class _PageSignals:
+    """Accumulates the fields analyze_business_website reports while a page is being parsed."""
+
+    def __init__(self):
+        self.title = None
+        self.meta_description = None
+        self.headings = []
+        self.paragraphs = []
+        self.paragraph_chars = 0
+        self.social_links = []
+        self._seen_social_links = set()
+        self.found_platforms = set()
+        self.anchors_scanned = 0
+
+    def add(self, el):
+        tag = el.tag
+        if tag == 'title':
+            if self.title is None:
+                self.title = el.text
+        elif tag == 'meta':
+            if self.meta_description is None and el.get('name') == 'description':
+                self.meta_description = el.get('content')
+        elif tag in ('h1', 'h2', 'h3'):
+            if len(self.headings) < MAX_SAMPLE_ELEMENTS:
+                self.headings.append("".join(el.itertext()).strip())
+        elif tag == 'p':
+            if not self.paragraphs_done:
+                text = "".join(el.itertext()).strip()
+                # Length of " ".join(self.paragraphs), kept without building the string
+                self.paragraph_chars += len(text) + (1 if self.paragraphs else 0)
+                self.paragraphs.append(text)
+        elif tag == 'a':
+            if self.anchors_done:
+                return
+            self.anchors_scanned += 1
+            href = el.get('href')
+            if not href or len(href) <= 15 or href in self._seen_social_links:
+                return
+            match = SOCIAL_LINK_RE.search(href)
+            if match:
+                self._seen_social_links.add(href)
+                self.social_links.append(href)
+                self.found_platforms.add(match.lastgroup)
+
+    @property
+    def paragraphs_done(self) -> bool:
+        """Enough paragraph text has been collected to fill the text sample."""
+        return (
+            len(self.paragraphs) >= MAX_SAMPLE_ELEMENTS
+            or self.paragraph_chars > MAX_TEXT_SAMPLE_CHARS
+        )
+
+    @property
+    def anchors_done(self) -> bool:
+        """Every platform has a link, or the page has more anchors than are worth scanning."""
+        return (
+            len(self.found_platforms) >= SOCIAL_PLATFORM_COUNT
+            or self.anchors_scanned >= MAX_ANCHORS_SCANNED
+        )
+
+    @property
+    def complete(self) -> bool:
+        return (
+            self.title is not None
+            and len(self.headings) >= MAX_SAMPLE_ELEMENTS
+            and self.paragraphs_done
+            and self.anchors_done
+        )
+
+async def _fetch_page_signals_async(client: httpx.AsyncClient, url: str) -> _PageSignals:
+    """
+    Retries _stream_page_signals on transient HTTP errors, backing off exponentially
+    with jitter so concurrent callers don't retry in lockstep.
+    """
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            return await _stream_page_signals(client, url)
+        except RETRYABLE_EXCEPTIONS as e:
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+            delay = RETRY_WAIT_SECONDS * 2 ** attempt + random.random() * 0.2
+            logger.warning(f"Attempt {attempt + 1} for {url} failed ({type(e).__name__}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+async def _stream_page_signals(client: httpx.AsyncClient, url: str) -> _PageSignals:
+    """
+    Streams at most MAX_PAGE_BYTES of the page through an incremental lxml parser,
+    and stops reading as soon as every field has been collected.
+    """
+    logger.debug(f"Streaming GET request to {url}")
+    signals = _PageSignals()
+
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        # Decode in Python, as response.text would: the header charset when Python knows
+        # it, else UTF-8. libxml2 rejects many charset aliases that Python accepts.
+        decoder = codecs.getincrementaldecoder(response.encoding)(errors='replace')
+        parser = etree.HTMLPullParser(events=('end',))
+        received = 0
+
+        async for chunk in response.aiter_bytes():
+            chunk = chunk[:MAX_PAGE_BYTES - received]
+            received += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            for _, el in parser.read_events():
+                signals.add(el)
+            if signals.complete:
+                return signals
+            if received >= MAX_PAGE_BYTES:
+                logger.info(f"Stopped reading {url} after {received} bytes")
+                break
+
+        parser.feed(decoder.decode(b'', final=True))
+        parser.close()
+        for _, el in parser.read_events():
+            signals.add(el)
+
+    return signals
+
+def _normalize_url(url: str) -> str:
+    """Lowercases scheme and host and drops the fragment, so equivalent URLs share a cache entry."""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ""))
+
+@alru_cache(maxsize=WEBSITE_CACHE_MAX_SIZE, ttl=WEBSITE_CACHE_TTL_SECONDS)
+async def _cached_page_signals(normalized_url: str) -> _PageSignals:
+    """Fetches page signals for a normalized URL. Failures raise, so they are never cached."""
+    return await _fetch_page_signals_async(_HTTP_CLIENT, normalized_url)
 
 @tool(args_schema=WebsiteAnalysisInput)
 async def analyze_business_website(url: str) -> str:
@@ -49,40 +206,24 @@ async def analyze_business_website(url: str) -> str:
     Asynchronously analyzes web content from a URL to extract potential industry, products/services,
     audience hints, and social links. Handles errors gracefully. Returns a JSON string summary.
     """
-    headers = {'User-Agent': 'Mozilla/5.0'}
     result_dict = {"url": url, "status": "success"}
     logger.info(f"Analyzing website: {url}")
 
     try:
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await _execute_request_async(client, "GET", url, headers=headers)
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            title = soup.find('title').string if soup.find('title') else "Not found"
-            description_tag = soup.find('meta', attrs={'name': 'description'})
-            meta_description = description_tag['content'] if description_tag else "Not found"
-            headings = [h.text.strip() for h in soup.find_all(['h1', 'h2', 'h3'], limit=10)]
-            paragraphs = [p.text.strip() for p in soup.find_all('p', limit=10)]
-            text_content = " ".join(paragraphs)
-            social_links = []
-            for a in soup.find_all('a', href=True):
-                href = a['href']
-                if isinstance(href, str) and any(domain in href for domain in [
-                    "facebook.com/", "twitter.com/", "instagram.com/", "linkedin.com/company/",
-                    "linkedin.com/in/", "youtube.com/channel/", "youtube.com/user/"
-                ]):
-                    if href not in social_links and len(href) > 15:
-                        social_links.append(href)
-
-            result_dict.update({
-                "title": title,
-                "meta_description": meta_description,
-                "headings_sample": headings or ["Not found"],
-                "text_content_sample": text_content[:500] + ("..." if len(text_content) > 500 else "") or "Not found",
-                "detected_social_links": social_links or ["None found"],
-                "initial_guessed_industry": "Unknown - Requires LLM interpretation or user confirmation"
-            })
-            logger.info(f"Website analysis successful for {url}")
+        signals = await _cached_page_signals(_normalize_url(url))
+        text_content = " ".join(signals.paragraphs)[:MAX_TEXT_SAMPLE_CHARS]
+        if signals.paragraph_chars > MAX_TEXT_SAMPLE_CHARS:
+            text_content += "..."
+
+        result_dict.update({
+            "title": signals.title or "Not found",
+            "meta_description": signals.meta_description or "Not found",
+            "headings_sample": signals.headings or ["Not found"],
+            "text_content_sample": text_content or "Not found",
+            "detected_social_links": signals.social_links or ["None found"],
+            "initial_guessed_industry": "Unknown - Requires LLM interpretation or user confirmation"
+        })
+        logger.info(f"Website analysis successful for {url}")
 
     except httpx.RequestError as e:
         logger.error(f"HTTP error fetching {url}: {e}")
@@ -91,7 +232,89 @@ async def analyze_business_website(url: str) -> str:
         logger.error(f"Failed to parse {url}: {e}", exc_info=True)
         result_dict.update({"status": "error", "error": f"Failed to parse content from {url}: {str(e)}"})
 
-    return json.dumps(result_dict, default=str)
+    return _dumps(result_dict)
+
+# One TrendReq per worker thread: its payload state can't be shared, and a single locked
+# session would serialize every Trends round-trip across users
+_PYTRENDS_LOCAL = threading.local()
+
+@functools.lru_cache(maxsize=1)
+def _import_trends_modules():
+    """
+    Imports pytrends, numpy and pandas on the first trends call rather than at startup,
+    since pandas alone adds around half a second to every cold start. Raises ImportError.
+    """
+    from pytrends.request import TrendReq
+    import numpy as np
+    import pandas as pd
+    return TrendReq, np, pd
+
+def _get_pytrends():
+    """
+    Returns this thread's TrendReq session, created on its first use there because the
+    constructor already makes a request to Google for cookies. asyncio.to_thread reuses
+    the default executor's threads, so each session serves many calls.
+    """
+    pytrends = getattr(_PYTRENDS_LOCAL, 'session', None)
+    if pytrends is None:
+        TrendReq, _, _ = _import_trends_modules()
+        pytrends = _PYTRENDS_LOCAL.session = TrendReq(hl='en-US', tz=360)
+    return pytrends
+
+@ttl_cache(maxsize=TRENDS_CACHE_MAX_SIZE, ttl=TRENDS_CACHE_TTL_SECONDS)
+def _cached_trends(keywords: tuple, timeframe: str) -> dict:
+    """
+    Fetches and summarizes interest over time for a sorted keyword tuple. Only the summary
+    dict is cached, never the DataFrame; API failures raise so they are not cached.
+    """
+    _, np, pd = _import_trends_modules()
+
+    pytrends = _get_pytrends()
+    pytrends.build_payload(kw_list=list(keywords), cat=0, timeframe=timeframe, geo='', gprop='')
+    df = pytrends.interest_over_time()
+
+    if not isinstance(df, pd.DataFrame) or df.empty:
+        return {
+            "interest_over_time_summary": "No interest over time data found.",
+            "warning": "Received empty or invalid data from Pytrends."
+        }
+
+    if 'isPartial' in df.columns:
+        df = df.drop(columns=['isPartial'], errors='ignore')
+
+    processed_keywords = [
+        kw for kw in keywords
+        if kw in df.columns
+    ]
+
+    if not processed_keywords:
+        return {
+            "interest_over_time_summary": "No data found for the specified keywords in the dataframe."
+        }
+
+    # One (time x keyword) array; first/last valid values per column without per-keyword Series
+    values = df[processed_keywords].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(values)
+    columns = np.arange(values.shape[1])
+    first_vals = values[valid.argmax(axis=0), columns]
+    last_vals = values[len(values) - 1 - valid[::-1].argmax(axis=0), columns]
+    changes = np.select(
+        [last_vals > first_vals * 1.05, first_vals > last_vals * 1.05],
+        ["Increasing", "Decreasing"],
+        default="Stable"
+    )
+
+    summary_points = {
+        kw: (
+            f"{change} trend (relative score: first={first_val:.1f}, last={last_val:.1f})"
+            if has_data else "Insufficient numeric data"
+        )
+        for kw, has_data, change, first_val, last_val
+        in zip(processed_keywords, valid.any(axis=0), changes, first_vals, last_vals)
+    }
+
+    iot_summary = f"Interest over time summary: {summary_points}"
+    return {"interest_over_time_summary": iot_summary}
 
 @tool(args_schema=GoogleTrendsInput)
 async def google_trends_analyzer(keywords: List[str], timeframe: str = "today 3-m") -> str:
@@ -104,59 +327,20 @@ async def google_trends_analyzer(keywords: List[str], timeframe: str = "today 3-
 
     def _fetch_trends_sync(_keywords: List[str], _timeframe: str):
         """Synchronous pytrends logic, run in a thread."""
-        if not TrendReq or not pd:
+        try:
+            _import_trends_modules()
+        except ImportError:
             raise ImportError(
                 "Pytrends library or pandas is not available. "
                 "Install with: pip install pytrends pandas."
             )
 
         try:
-            pytrends = TrendReq(hl='en-US', tz=360)
-            pytrends.build_payload(kw_list=_keywords, cat=0, timeframe=_timeframe, geo='', gprop='')
-            interest_over_time_df = pytrends.interest_over_time()
+            return _cached_trends(tuple(sorted(_keywords)), _timeframe)
         except Exception as e:
             logger.error(f"Pytrends API call failed: {e}", exc_info=True)
             return {"error": f"Pytrends API error: {str(e)}"}
 
-        if not isinstance(interest_over_time_df, pd.DataFrame) or interest_over_time_df.empty:
-            return {
-                "interest_over_time_summary": "No interest over time data found.",
-                "warning": "Received empty or invalid data from Pytrends."
-            }
-
-        if 'isPartial' in interest_over_time_df.columns:
-            interest_over_time_df = interest_over_time_df.drop(columns=['isPartial'], errors='ignore')
-
-        summary_points = {}
-        processed_keywords = [
-            kw for kw in _keywords
-            if kw in interest_over_time_df.columns
-        ]
-
-        if not processed_keywords:
-            return {
-                "interest_over_time_summary": "No data found for the specified keywords in the dataframe."
-            }
-
-        for kw in processed_keywords:
-            numeric_series = pd.to_numeric(interest_over_time_df[kw], errors='coerce').dropna()
-            if not numeric_series.empty:
-                first_val = numeric_series.iloc[0]
-                last_val = numeric_series.iloc[-1]
-                change = "Stable"
-                if last_val > first_val * 1.05:
-                    change = "Increasing"
-                elif first_val > last_val * 1.05:
-                    change = "Decreasing"
-                summary_points[kw] = (
-                    f"{change} trend (relative score: first={first_val:.1f}, last={last_val:.1f})"
-                )
-            else:
-                summary_points[kw] = "Insufficient numeric data"
-
-        iot_summary = f"Interest over time summary: {summary_points}"
-        return {"interest_over_time_summary": iot_summary}
-
     try:
         trends_data = await asyncio.to_thread(_fetch_trends_sync, keywords, timeframe)
         result_dict.update(trends_data)
@@ -172,4 +356,4 @@ async def google_trends_analyzer(keywords: List[str], timeframe: str = "today 3-
         logger.error(f"Unexpected error in google_trends_analyzer: {e}", exc_info=True)
         result_dict.update({"status": "error", "error": f"Failed to get Google Trends data: {str(e)}"})
 
-    return json.dumps(result_dict, default=str)
+    return _dumps(result_dict)